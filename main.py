@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 
-from shazam import Shazam
+from shazam import Shazam, fingerprint_file, init_fingerprint_worker
 
 
 def add_song(args):
@@ -24,11 +26,30 @@ def add_dir(args):
         print(f"No audio files found in {args.directory}")
         return
 
-    for filepath in files:
-        song_id = shazam.add_song(str(filepath))
-        print(f"Added: {filepath.stem} (id={song_id})")
-
-    print(f"\nAdded {len(files)} songs")
+    # Fingerprint files in parallel, one single-threaded worker per core;
+    # inserts stay on this process's single connection and the whole
+    # directory is committed at once. Files that fail to decode are skipped
+    # so they don't roll back the rest; a crashed worker pool is not.
+    added = []
+    executor = ProcessPoolExecutor(initializer=init_fingerprint_worker)
+    with shazam.db.transaction(), executor:
+        futures = [executor.submit(fingerprint_file, str(f)) for f in files]
+        for filepath, future in zip(files, futures):
+            try:
+                hashes, offsets = future.result()
+            except BrokenProcessPool:
+                raise
+            except Exception as e:
+                print(f"Skipped: {filepath.name} ({e!r})")
+                continue
+            song_id = shazam.db.insert_song(filepath.stem, hashes, offsets)
+            added.append((filepath.stem, song_id))
+
+    # Only report songs once they are committed
+    for name, song_id in added:
+        print(f"Added: {name} (id={song_id})")
+
+    print(f"\nAdded {len(added)} songs")
 
 
 def identify(args):
@@ -1,4 +1,4 @@
-from .shazam import Shazam
+from .shazam import Shazam, fingerprint_file, init_fingerprint_worker
 from .matcher import MatchResult
 
-__all__ = ["Shazam", "MatchResult"]
+__all__ = ["Shazam", "MatchResult", "fingerprint_file", "init_fingerprint_worker"]
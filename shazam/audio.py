@@ -1,13 +1,28 @@
+from pathlib import Path
+
 import numpy as np
 import librosa
+import soundfile
+import soxr
+
+# Fingerprints only use content below ~5 kHz
+SAMPLE_RATE = 11025
 
-SAMPLE_RATE = 44100
+# Formats libsndfile decodes natively; anything else goes through librosa
+SOUNDFILE_EXTENSIONS = {".wav", ".flac", ".ogg"}
 
 
 def load_audio(filepath: str) -> tuple[np.ndarray, int]:
-    """Load audio file, convert to mono, resample to 44100Hz."""
-    audio, sr = librosa.load(filepath, sr=SAMPLE_RATE, mono=True)
-    return audio, sr
+    """Load audio file, convert to mono, resample to 11025Hz."""
+    if Path(filepath).suffix.lower() not in SOUNDFILE_EXTENSIONS:
+        audio, sr = librosa.load(filepath, sr=SAMPLE_RATE, mono=True)
+        return audio, sr
+
+    audio, sr = soundfile.read(filepath, dtype="float32", always_2d=True)
+    audio = audio.mean(axis=1)
+    if sr != SAMPLE_RATE:
+        audio = soxr.resample(audio, sr, SAMPLE_RATE, quality="HQ")
+    return audio, SAMPLE_RATE
 
 
 def normalize(audio: np.ndarray) -> np.ndarray:
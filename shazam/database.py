@@ -1,98 +1,209 @@
 import sqlite3
+from contextlib import contextmanager
 from pathlib import Path
 
+import numpy as np
+
+# Stored in PRAGMA user_version. Bump whenever the hash format or the
+# fingerprints table layout changes; version 0 databases hold SHA-1 text hashes
+SCHEMA_VERSION = 1
+
+MATCH_DTYPE = np.dtype([("song_id", np.int64), ("db_offset", np.int64), ("query_offset", np.int64)])
+
+# Hot-path statements, kept as fixed strings so each compiles once and is
+# then served from the connection's statement cache
+INSERT_FINGERPRINT_SQL = "INSERT INTO fingerprints (hash, song_id, time_offset) VALUES (?, ?, ?)"
+INSERT_QUERY_HASH_SQL = "INSERT INTO query_hashes (hash, query_offset) VALUES (?, ?)"
+MATCH_SQL = """
+    SELECT f.song_id, f.time_offset, q.query_offset
+    FROM query_hashes q
+    JOIN fingerprints f ON f.hash = q.hash
+"""
+# Same matches, restricted to the songs sharing the most hashes with the query
+CANDIDATE_MATCH_SQL = """
+    WITH candidates AS (
+        SELECT f.song_id
+        FROM query_hashes q
+        JOIN fingerprints f ON f.hash = q.hash
+        GROUP BY f.song_id
+        ORDER BY COUNT(*) DESC
+        LIMIT ?
+    )
+    SELECT f.song_id, f.time_offset, q.query_offset
+    FROM query_hashes q
+    JOIN fingerprints f ON f.hash = q.hash
+    WHERE f.song_id IN candidates
+"""
+
+# Rows converted to Python ints at a time when streaming into executemany
+ROW_CHUNK_SIZE = 4096
+
+
+def _fingerprint_rows(song_id: int, hashes: np.ndarray, offsets: np.ndarray):
+    """Yield (hash, song_id, time_offset) rows, converting arrays chunk by chunk.
+
+    Only ROW_CHUNK_SIZE rows exist as Python objects at once, so memory stays
+    flat however long the song is.
+    """
+    for start in range(0, len(hashes), ROW_CHUNK_SIZE):
+        stop = start + ROW_CHUNK_SIZE
+        for h, t in zip(hashes[start:stop].tolist(), offsets[start:stop].tolist()):
+            yield h, song_id, t
+
 
 class FingerprintDatabase:
     """SQLite database for storing and querying audio fingerprints."""
 
     def __init__(self, db_path: str):
         self.db_path = db_path
+        # Autocommit mode; writes are grouped explicitly via transaction()
+        self.conn = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+        self._configure()
         self._init_db()
+        self._query_cursor = self.conn.cursor()
+
+    def _configure(self):
+        """Tune SQLite for bulk fingerprint ingest."""
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        self.conn.execute("PRAGMA cache_size=-64000")
+        self.conn.execute("PRAGMA mmap_size=268435456")
+
+    def close(self):
+        """Close the database connection."""
+        self.conn.close()
+
+    @contextmanager
+    def transaction(self):
+        """Group all statements in the block into a single transaction.
+
+        Nested blocks join the enclosing transaction, so callers can wrap a
+        whole batch of insert_song calls in one commit.
+        """
+        if self.conn.in_transaction:
+            yield self.conn
+            return
+
+        self.conn.execute("BEGIN")
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
 
     def _init_db(self):
-        """Initialize database tables if they don't exist."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS songs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL
+        """Initialize database tables if they don't exist.
+
+        Raises:
+            RuntimeError: If the database was written with an older
+                fingerprint format. Old hashes can't be converted, since
+                SHA-1 digests don't keep the peak frequencies.
+        """
+        with self.transaction() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            has_fingerprints = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'fingerprints'"
+            ).fetchone()
+            if has_fingerprints and version != SCHEMA_VERSION:
+                raise RuntimeError(
+                    f"{self.db_path} uses fingerprint schema version {version}, "
+                    f"expected {SCHEMA_VERSION}; re-add the songs to a new database"
                 )
-            """)
+
+            if not has_fingerprints:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS songs (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        name TEXT NOT NULL
+                    )
+                """)
+                conn.execute("""
+                    CREATE TABLE fingerprints (
+                        hash INTEGER NOT NULL,
+                        song_id INTEGER NOT NULL,
+                        time_offset INTEGER NOT NULL,
+                        PRIMARY KEY (hash, song_id, time_offset),
+                        FOREIGN KEY (song_id) REFERENCES songs(id)
+                    ) WITHOUT ROWID
+                """)
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+            # Per-connection scratch table for batched lookups in query()
             conn.execute("""
-                CREATE TABLE IF NOT EXISTS fingerprints (
-                    hash TEXT NOT NULL,
-                    song_id INTEGER NOT NULL,
-                    time_offset INTEGER NOT NULL,
-                    FOREIGN KEY (song_id) REFERENCES songs(id)
+                CREATE TEMP TABLE IF NOT EXISTS query_hashes (
+                    hash INTEGER NOT NULL,
+                    query_offset INTEGER NOT NULL
                 )
             """)
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_hash ON fingerprints(hash)")
-            conn.commit()
 
-    def insert_song(self, name: str, hashes: list[tuple[str, int, int]]) -> int:
+    def insert_song(self, name: str, hashes: np.ndarray, offsets: np.ndarray) -> int:
         """Insert a song and its fingerprints.
 
         Args:
             name: Song name/title.
-            hashes: List of (hash_string, time_offset, _) tuples.
+            hashes: Array of hash values.
+            offsets: Array of anchor time offsets, one per hash.
 
         Returns:
             The song_id of the inserted song.
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.transaction() as conn:
             cursor = conn.execute("INSERT INTO songs (name) VALUES (?)", (name,))
             song_id = cursor.lastrowid
 
-            # Insert fingerprints
-            fingerprint_data = [(h, song_id, t) for h, t, _ in hashes]
+            # Insert fingerprints in key order so rows append to the clustered B-tree
+            order = np.argsort(hashes, kind="stable")
             conn.executemany(
-                "INSERT INTO fingerprints (hash, song_id, time_offset) VALUES (?, ?, ?)",
-                fingerprint_data
+                INSERT_FINGERPRINT_SQL, _fingerprint_rows(song_id, hashes[order], offsets[order])
             )
-            conn.commit()
             return song_id
 
-    def query(self, hashes: list[tuple[str, int, int]]) -> list[tuple[int, int, int]]:
+    def query(
+        self, hashes: np.ndarray, offsets: np.ndarray, max_candidates: int = None
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
         """Query database for matching hashes.
 
         Args:
-            hashes: List of (hash_string, query_time_offset, _) tuples.
+            hashes: Array of hash values.
+            offsets: Array of query time offsets, one per hash.
+            max_candidates: If set, only return matches from this many songs,
+                picked by how many hashes they share with the query.
 
         Returns:
-            List of (song_id, db_time_offset, query_time_offset) for matches.
+            Tuple of (song_ids, db_time_offsets, query_time_offsets) arrays,
+            one entry per match.
         """
-        matches = []
-        with sqlite3.connect(self.db_path) as conn:
-            for hash_val, query_offset, _ in hashes:
-                cursor = conn.execute(
-                    "SELECT song_id, time_offset FROM fingerprints WHERE hash = ?",
-                    (hash_val,)
-                )
-                for song_id, db_offset in cursor.fetchall():
-                    matches.append((song_id, db_offset, query_offset))
-        return matches
+        cursor = self._query_cursor
+        with self.transaction():
+            # Load query hashes into the temp table and resolve them in one join
+            cursor.executemany(INSERT_QUERY_HASH_SQL, zip(hashes.tolist(), offsets.tolist()))
+            if max_candidates is None:
+                rows = cursor.execute(MATCH_SQL)
+            else:
+                rows = cursor.execute(CANDIDATE_MATCH_SQL, (max_candidates,))
+            matches = np.fromiter(rows, dtype=MATCH_DTYPE)
+            cursor.execute("DELETE FROM query_hashes")
+        return matches["song_id"], matches["db_offset"], matches["query_offset"]
 
     def get_song(self, song_id: int) -> str | None:
         """Get song name by ID."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute("SELECT name FROM songs WHERE id = ?", (song_id,))
-            row = cursor.fetchone()
-            return row[0] if row else None
+        cursor = self.conn.execute("SELECT name FROM songs WHERE id = ?", (song_id,))
+        row = cursor.fetchone()
+        return row[0] if row else None
 
     def list_songs(self) -> list[tuple[int, str]]:
         """List all songs in database."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute("SELECT id, name FROM songs ORDER BY id")
-            return cursor.fetchall()
+        cursor = self.conn.execute("SELECT id, name FROM songs ORDER BY id")
+        return cursor.fetchall()
 
     def song_count(self) -> int:
         """Get number of songs in database."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute("SELECT COUNT(*) FROM songs")
-            return cursor.fetchone()[0]
+        cursor = self.conn.execute("SELECT COUNT(*) FROM songs")
+        return cursor.fetchone()[0]
 
     def fingerprint_count(self) -> int:
         """Get total number of fingerprints in database."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute("SELECT COUNT(*) FROM fingerprints")
-            return cursor.fetchone()[0]
+        cursor = self.conn.execute("SELECT COUNT(*) FROM fingerprints")
+        return cursor.fetchone()[0]
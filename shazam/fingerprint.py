@@ -1,46 +1,74 @@
-import hashlib
+import numpy as np
+from numba import njit, prange
 
 TARGET_ZONE_START = 1
 TARGET_ZONE_END = 200
 FAN_OUT = 15
 
+# Bit layout of a packed hash: freq1 | freq2 | delta_t
+FREQ_BITS = 12
+DELTA_T_BITS = 8
+FREQ_MASK = (1 << FREQ_BITS) - 1
+DELTA_T_MASK = (1 << DELTA_T_BITS) - 1
 
-def generate_hashes(peaks: list[tuple[int, int]], song_id: int = None) -> list[tuple[str, int, int]]:
+
+@njit(cache=True)
+def pack_hash(f1, f2, delta_t):
+    """Pack an anchor-target pair into a 32-bit integer hash."""
+    return (
+        ((f1 & FREQ_MASK) << (FREQ_BITS + DELTA_T_BITS))
+        | ((f2 & FREQ_MASK) << DELTA_T_BITS)
+        | (delta_t & DELTA_T_MASK)
+    )
+
+
+@njit(cache=True, parallel=True)
+def _hash_kernel(t, f, starts, stops):
+    """Hash every anchor-target pair of time-sorted peaks.
+
+    Anchor i is paired with targets starts[i]..stops[i]-1. Offsets into the
+    output follow directly from the range lengths, so anchors are filled in
+    parallel with no bounds checks or early exits in the inner loop.
+    """
+    n = len(t)
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.maximum(stops - starts, 0))
+
+    out_hash = np.empty(offsets[n], dtype=np.int64)
+    out_t1 = np.empty(offsets[n], dtype=np.int32)
+    for i in prange(n):
+        k = offsets[i]
+        for j in range(starts[i], stops[i]):
+            out_hash[k] = pack_hash(np.int64(f[i]), np.int64(f[j]), np.int64(t[j] - t[i]))
+            out_t1[k] = t[i]
+            k += 1
+    return out_hash, out_t1
+
+
+def generate_hashes(peaks: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
     """Generate fingerprint hashes from peak pairs.
 
     Args:
-        peaks: List of (time_idx, freq_idx) tuples, sorted by time.
-        song_id: Optional song identifier to include in output.
+        peaks: Array of shape (num_peaks, 2) holding (time_idx, freq_idx)
+            rows, sorted by time as returned by find_peaks.
 
     Returns:
-        List of (hash_string, anchor_time, song_id) tuples.
+        Tuple of (hash_values, anchor_times) arrays of equal length.
+
+    Raises:
+        ValueError: If peaks are not sorted by time.
     """
-    # Sort peaks by time
-    peaks = sorted(peaks, key=lambda x: x[0])
-
-    hashes = []
-    for i, (t1, f1) in enumerate(peaks):
-        # Find targets in the zone after this anchor
-        targets = []
-        for j in range(i + 1, len(peaks)):
-            t2, f2 = peaks[j]
-            delta_t = t2 - t1
-
-            if delta_t < TARGET_ZONE_START:
-                continue
-            if delta_t > TARGET_ZONE_END:
-                break
-
-            targets.append((t2, f2, delta_t))
-
-            if len(targets) >= FAN_OUT:
-                break
-
-        # Create hash for each anchor-target pair
-        for t2, f2, delta_t in targets:
-            # Hash: freq1|freq2|delta_t
-            hash_input = f"{f1}|{f2}|{delta_t}"
-            hash_value = hashlib.sha1(hash_input.encode()).hexdigest()[:20]
-            hashes.append((hash_value, t1, song_id))
-
-    return hashes
+    peaks = np.asarray(peaks, dtype=np.int32).reshape(-1, 2)
+    t = np.ascontiguousarray(peaks[:, 0])
+    f = np.ascontiguousarray(peaks[:, 1])
+
+    # Target ranges come from searchsorted, which needs time-sorted peaks
+    if np.any(t[1:] < t[:-1]):
+        raise ValueError("peaks must be sorted by time")
+
+    # Target range of each anchor: skip peaks closer than TARGET_ZONE_START,
+    # stop past TARGET_ZONE_END or after FAN_OUT targets
+    starts = np.maximum(np.arange(1, len(t) + 1), np.searchsorted(t, t + TARGET_ZONE_START, side="left"))
+    stops = np.minimum(np.searchsorted(t, t + TARGET_ZONE_END, side="right"), starts + FAN_OUT)
+
+    return _hash_kernel(t, f, starts, stops)
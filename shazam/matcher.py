@@ -1,9 +1,12 @@
-from collections import defaultdict
 from dataclasses import dataclass
 
+import numpy as np
+
 from .database import FingerprintDatabase
 
 MIN_MATCHES = 5
+# Songs with the most raw hash hits that go on to time-alignment voting
+MAX_CANDIDATES = 8
 
 
 @dataclass
@@ -15,35 +18,38 @@ class MatchResult:
     aligned_matches: int
 
 
-def find_matches(query_hashes: list[tuple[str, int, int]], db: FingerprintDatabase) -> MatchResult | None:
+def find_matches(
+    query_hashes: np.ndarray, query_offsets: np.ndarray, db: FingerprintDatabase
+) -> MatchResult | None:
     """Find best matching song using time-alignment voting.
 
     Args:
-        query_hashes: List of (hash_string, query_time_offset, _) tuples.
+        query_hashes: Array of hash values.
+        query_offsets: Array of query time offsets, one per hash.
         db: Fingerprint database to query.
 
     Returns:
         MatchResult if a match is found, None otherwise.
     """
-    if not query_hashes:
+    if len(query_hashes) == 0:
         return None
 
-    # Query all hashes from database
-    matches = db.query(query_hashes)
+    # Query all hashes from database, keeping only the top candidate songs
+    song_ids, db_offsets, match_offsets = db.query(query_hashes, query_offsets, MAX_CANDIDATES)
 
-    if not matches:
+    if len(song_ids) == 0:
         return None
 
-    # Group by (song_id, time_diff) where time_diff = db_offset - query_offset
-    alignment_counts = defaultdict(int)
-    for song_id, db_offset, query_offset in matches:
-        time_diff = db_offset - query_offset
-        alignment_counts[(song_id, time_diff)] += 1
+    # Group by (song_id, time_diff) where time_diff = db_offset - query_offset,
+    # packed into one int64 key: song_id in the high word, time_diff below
+    time_diffs = db_offsets - match_offsets
+    keys = (song_ids << 32) | time_diffs.astype(np.uint32).astype(np.int64)
+    alignments, alignment_counts = np.unique(keys, return_counts=True)
 
     # Find best alignment
-    best_key = max(alignment_counts, key=alignment_counts.get)
-    best_count = alignment_counts[best_key]
-    best_song_id = best_key[0]
+    best = np.argmax(alignment_counts)
+    best_count = int(alignment_counts[best])
+    best_song_id = int(alignments[best] >> 32)
 
     # Check minimum threshold
     if best_count < MIN_MATCHES:
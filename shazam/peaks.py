@@ -1,34 +1,115 @@
 import numpy as np
-from scipy.ndimage import maximum_filter
+from numba import njit, prange
 
 NEIGHBORHOOD_SIZE = 20
 
 
-def find_peaks(spectrogram: np.ndarray, amp_min: float = None) -> list[tuple[int, int]]:
+@njit(cache=True, parallel=True)
+def _mean_std(spectrogram):
+    """Mean and standard deviation in one pass (Welford per row, then merged)."""
+    n_rows, n_cols = spectrogram.shape
+    row_mean = np.zeros(n_rows)
+    row_m2 = np.zeros(n_rows)
+    for r in prange(n_rows):
+        mean = 0.0
+        m2 = 0.0
+        for c in range(n_cols):
+            x = np.float64(spectrogram[r, c])
+            delta = x - mean
+            mean += delta / (c + 1)
+            m2 += delta * (x - mean)
+        row_mean[r] = mean
+        row_m2[r] = m2
+
+    # Combine rows with Chan's parallel update; every row has n_cols samples
+    mean = 0.0
+    m2 = 0.0
+    count = 0
+    for r in range(n_rows):
+        delta = row_mean[r] - mean
+        total = count + n_cols
+        mean += delta * n_cols / total
+        m2 += row_m2[r] + delta * delta * count * n_cols / total
+        count = total
+    if count == 0:
+        return 0.0, 0.0
+    return mean, np.sqrt(m2 / count)
+
+
+@njit(cache=True)
+def _is_peak(spectrogram, f, t, amp_min, size):
+    """Check threshold and the size x size local-maximum condition at (f, t)."""
+    value = spectrogram[f, t]
+    if value <= amp_min:
+        return False
+
+    # Same window as scipy.ndimage.maximum_filter(size=size); with reflect
+    # boundaries, clipping the window at the edges is equivalent
+    n_freqs, n_times = spectrogram.shape
+    f_lo = max(f - size // 2, 0)
+    f_hi = min(f - size // 2 + size, n_freqs)
+    t_lo = max(t - size // 2, 0)
+    t_hi = min(t - size // 2 + size, n_times)
+    for tt in range(t_lo, t_hi):
+        for ff in range(f_lo, f_hi):
+            if spectrogram[ff, tt] > value:
+                return False
+    return True
+
+
+@njit(cache=True, parallel=True)
+def _peak_kernel(spectrogram, amp_min, size):
+    """Find thresholded local maxima as (time_idx, freq_idx) rows.
+
+    Rows are ordered by time then frequency. Like the hashing kernel, a
+    first parallel pass counts peaks per time frame and a second pass
+    writes them at their final position. The first pass marks each peak in
+    a per-frame mask, so the neighborhood scan runs only once.
+    """
+    n_freqs, n_times = spectrogram.shape
+    is_peak = np.zeros((n_times, n_freqs), dtype=np.bool_)
+    counts = np.zeros(n_times, dtype=np.int64)
+    for t in prange(n_times):
+        for f in range(n_freqs):
+            if _is_peak(spectrogram, f, t, amp_min, size):
+                is_peak[t, f] = True
+                counts[t] += 1
+
+    offsets = np.zeros(n_times + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(counts)
+
+    peaks = np.empty((offsets[n_times], 2), dtype=np.int32)
+    for t in prange(n_times):
+        k = offsets[t]
+        for f in range(n_freqs):
+            if is_peak[t, f]:
+                peaks[k, 0] = t
+                peaks[k, 1] = f
+                k += 1
+    return peaks
+
+
+def find_peaks(spectrogram: np.ndarray, amp_min: float = None) -> np.ndarray:
     """Find local maxima in spectrogram (constellation points).
 
     Args:
-        spectrogram: 2D array (frequency_bins, time_frames)
-        amp_min: Minimum amplitude threshold. If None, uses mean + 2*std.
+        spectrogram: 2D array (frequency_bins, time_frames), as returned by
+            compute_spectrogram.
+        amp_min: Minimum peak value, in the spectrogram's own units. For
+            compute_spectrogram output that is quantized dB, 0..32767 for
+            DB_FLOOR..0 dB relative to the loudest bin (see
+            spectrogram.DB_SCALE), not linear amplitude. If None, uses
+            mean + 2*std.
 
     Returns:
-        List of (time_idx, freq_idx) tuples for each peak.
+        int32 array of shape (num_peaks, 2) holding (time_idx, freq_idx)
+        rows, sorted by time.
     """
-    # Apply maximum filter to find local maxima
-    local_max = maximum_filter(spectrogram, size=NEIGHBORHOOD_SIZE)
-
-    # Points that equal local max are peaks
-    is_peak = spectrogram == local_max
-
     # Set amplitude threshold
     if amp_min is None:
-        amp_min = np.mean(spectrogram) + 2 * np.std(spectrogram)
-
-    # Filter by amplitude
-    is_peak &= spectrogram > amp_min
+        mean, std = _mean_std(spectrogram)
+        amp_min = mean + 2 * std
 
-    # Get coordinates (freq_idx, time_idx) and convert to (time_idx, freq_idx)
-    freq_idx, time_idx = np.where(is_peak)
+    # Threshold and local-maximum test fused into a single pass
+    return _peak_kernel(spectrogram, amp_min, NEIGHBORHOOD_SIZE)
 
-    # Return as list of (time, freq) tuples
-    return list(zip(time_idx.tolist(), freq_idx.tolist()))
@@ -1,13 +1,48 @@
 from pathlib import Path
 
+import numba
+import numpy as np
+
 from .audio import load_audio
-from .spectrogram import compute_spectrogram
+from .spectrogram import compute_spectrogram, set_fft_threads
 from .peaks import find_peaks
 from .fingerprint import generate_hashes
 from .database import FingerprintDatabase
 from .matcher import find_matches, MatchResult
 
 
+def fingerprint_file(filepath: str) -> tuple[np.ndarray, np.ndarray]:
+    """Generate fingerprints for an audio file.
+
+    Module-level so it can be pickled and run in worker processes.
+
+    Args:
+        filepath: Path to audio file.
+
+    Returns:
+        Tuple of (hash_values, time_offsets) arrays.
+    """
+    audio, sr = load_audio(filepath)
+    # Built whole rather than fused tile by tile with peak picking: the
+    # mean + 2*std threshold is global, so a streaming path has to compute
+    # every FFT twice and measured no faster
+    spectrogram = compute_spectrogram(audio, sr)
+    peaks = find_peaks(spectrogram)
+    hashes = generate_hashes(peaks)
+    return hashes
+
+
+def init_fingerprint_worker():
+    """Make fingerprinting in this process single-threaded.
+
+    Meant as a ProcessPoolExecutor initializer: with one worker per core,
+    threaded numba kernels and FFTs inside each worker would oversubscribe
+    the CPU.
+    """
+    numba.set_num_threads(1)
+    set_fft_threads(1)
+
+
 class Shazam:
     """Main interface for audio fingerprinting and identification."""
 
@@ -15,20 +50,16 @@ class Shazam:
         """Initialize Shazam with database path."""
         self.db = FingerprintDatabase(db_path)
 
-    def fingerprint(self, filepath: str) -> list[tuple[str, int, int]]:
+    def fingerprint(self, filepath: str) -> tuple[np.ndarray, np.ndarray]:
         """Generate fingerprints for an audio file.
 
         Args:
             filepath: Path to audio file.
 
         Returns:
-            List of (hash_string, time_offset, None) tuples.
+            Tuple of (hash_values, time_offsets) arrays.
         """
-        audio, sr = load_audio(filepath)
-        spectrogram = compute_spectrogram(audio, sr)
-        peaks = find_peaks(spectrogram)
-        hashes = generate_hashes(peaks)
-        return hashes
+        return fingerprint_file(filepath)
 
     def add_song(self, filepath: str, name: str = None) -> int:
         """Add a song to the database.
@@ -43,8 +74,8 @@ class Shazam:
         if name is None:
             name = Path(filepath).stem
 
-        hashes = self.fingerprint(filepath)
-        song_id = self.db.insert_song(name, hashes)
+        hashes, offsets = self.fingerprint(filepath)
+        song_id = self.db.insert_song(name, hashes, offsets)
         return song_id
 
     def identify(self, filepath: str) -> MatchResult | None:
@@ -56,8 +87,8 @@ class Shazam:
         Returns:
             MatchResult if identified, None otherwise.
         """
-        hashes = self.fingerprint(filepath)
-        return find_matches(hashes, self.db)
+        hashes, offsets = self.fingerprint(filepath)
+        return find_matches(hashes, offsets, self.db)
 
     def list_songs(self) -> list[tuple[int, str]]:
         """List all songs in database."""
@@ -1,14 +1,142 @@
+import os
+import struct
+import tempfile
+from pathlib import Path
+
 import numpy as np
-from scipy.signal import stft
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.fft import rfft
+from scipy.signal import get_window
+
+try:
+    import pyfftw
+except ImportError:  # optional; scipy's pocketfft is used instead
+    pyfftw = None
+
+# Same time/frequency resolution as 4096/2048 at 44.1kHz
+FFT_SIZE = 1024
+HOP_SIZE = 512
+
+# Periodic Hann window, scaled so a full-scale sine peaks at 0.5
+WINDOW = get_window("hann", FFT_SIZE).astype(np.float32)
+WINDOW /= WINDOW.sum()
+
+# Magnitudes are stored as dB relative to the loudest bin, clipped to
+# [DB_FLOOR, 0] and mapped linearly onto [0, 32767]; peak picking only
+# compares values, so int16 loses nothing
+DB_FLOOR = -80.0
+DB_SCALE = 32767 / -DB_FLOOR
+
+# With pyFFTW, frames are transformed in fixed-size batches so a single plan
+# serves every song; the planner's wisdom is persisted between runs
+FFT_BATCH = 256
+WISDOM_PATH = Path.home() / ".cache" / "shazam_fftw" / "wisdom.bin"
+
+_fft_plan = None
+_fft_threads = os.cpu_count()
+
+
+def set_fft_threads(threads: int):
+    """Set how many threads each spectrogram FFT may use."""
+    global _fft_plan, _fft_threads
+    if threads != _fft_threads:
+        _fft_threads = threads
+        _fft_plan = None
+
+
+def _load_wisdom():
+    """Import saved FFTW wisdom, if any.
+
+    The file holds each of export_wisdom()'s byte strings behind a 4-byte
+    length. Wisdom is only a planning shortcut, so a missing or malformed
+    file is ignored and the plan is simply measured again.
+    """
+    try:
+        data = WISDOM_PATH.read_bytes()
+    except OSError:
+        return
 
-FFT_SIZE = 4096
-HOP_SIZE = 2048
+    wisdom = []
+    pos = 0
+    while pos + 4 <= len(data):
+        (size,) = struct.unpack_from("<I", data, pos)
+        pos += 4
+        wisdom.append(data[pos:pos + size])
+        pos += size
+    # One entry per precision, as export_wisdom() returns
+    if pos != len(data) or len(wisdom) != len(pyfftw.export_wisdom()):
+        return
+    pyfftw.import_wisdom(tuple(wisdom))
 
 
-def compute_spectrogram(audio: np.ndarray, sample_rate: int = 44100) -> np.ndarray:
-    """Compute magnitude spectrogram using STFT.
+def _save_wisdom():
+    """Persist FFTW wisdom so later runs skip measuring plans.
 
-    Returns 2D array: (frequency_bins, time_frames)
+    Written to a temp file and renamed into place, so concurrent workers
+    never see a partially written file.
     """
-    _, _, Zxx = stft(audio, fs=sample_rate, nperseg=FFT_SIZE, noverlap=FFT_SIZE - HOP_SIZE)
-    return np.abs(Zxx)
+    data = b"".join(struct.pack("<I", len(w)) + w for w in pyfftw.export_wisdom())
+    try:
+        WISDOM_PATH.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=WISDOM_PATH.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, WISDOM_PATH)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except OSError:
+        pass
+
+
+def _get_fft_plan():
+    """Build the batched FFTW plan once per process."""
+    global _fft_plan
+    if _fft_plan is None:
+        _load_wisdom()
+        frames = pyfftw.empty_aligned((FFT_BATCH, FFT_SIZE), dtype="float32")
+        _fft_plan = pyfftw.builders.rfft(
+            frames, axis=1, threads=_fft_threads, planner_effort="FFTW_MEASURE"
+        )
+        _save_wisdom()
+    return _fft_plan
+
+
+def _windowed_rfft(frames: np.ndarray) -> np.ndarray:
+    """Window each frame and return its non-negative frequency bins."""
+    if pyfftw is None:
+        return rfft(frames * WINDOW, axis=1, workers=_fft_threads)
+
+    plan = _get_fft_plan()
+    spectrum = np.empty((len(frames), FFT_SIZE // 2 + 1), dtype=np.complex64)
+    for start in range(0, len(frames), FFT_BATCH):
+        batch = frames[start:start + FFT_BATCH]
+        n = len(batch)
+        np.multiply(batch, WINDOW, out=plan.input_array[:n])
+        plan.input_array[n:] = 0
+        spectrum[start:start + n] = plan()[:n]
+    return spectrum
+
+
+def compute_spectrogram(audio: np.ndarray, sample_rate: int = 11025) -> np.ndarray:
+    """Compute quantized log-magnitude spectrogram using STFT.
+
+    Returns 2D int16 array: (frequency_bins, time_frames)
+    """
+    audio = np.asarray(audio, dtype=np.float32)
+
+    # Zero-pad half a frame on each side and up to a whole number of hops
+    pad = FFT_SIZE // 2
+    extra = -(len(audio) + 2 * pad - FFT_SIZE) % HOP_SIZE
+    audio = np.pad(audio, (pad, pad + extra))
+
+    # Frame without copying, then window and keep only the non-negative frequencies
+    frames = sliding_window_view(audio, FFT_SIZE)[::HOP_SIZE]
+    magnitude = np.abs(_windowed_rfft(frames)).T
+
+    # Relative to the loudest bin, so the floor follows the recording level
+    # instead of clipping quiet recordings away
+    reference = max(magnitude.max(initial=0), 1e-10)
+    db = np.clip(20 * np.log10(magnitude / reference + 1e-10), DB_FLOOR, 0)
+    return ((db - DB_FLOOR) * DB_SCALE).astype(np.int16)
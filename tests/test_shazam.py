@@ -0,0 +1,182 @@
+import sqlite3
+
+import numpy as np
+import pytest
+import soundfile
+from scipy.ndimage import maximum_filter
+
+from shazam import Shazam
+from shazam.audio import SAMPLE_RATE
+from shazam.database import FingerprintDatabase
+from shazam.fingerprint import FAN_OUT, TARGET_ZONE_END, TARGET_ZONE_START, generate_hashes, pack_hash
+from shazam.peaks import NEIGHBORHOOD_SIZE, find_peaks
+
+
+def reference_peaks(spectrogram):
+    """Peak picking as originally written with scipy's 2D maximum_filter."""
+    local_max = maximum_filter(spectrogram, size=NEIGHBORHOOD_SIZE)
+    is_peak = spectrogram == local_max
+    is_peak &= spectrogram > np.mean(spectrogram) + 2 * np.std(spectrogram)
+    freq_idx, time_idx = np.where(is_peak)
+    peaks = sorted(zip(time_idx.tolist(), freq_idx.tolist()), key=lambda x: x[0])
+    return np.array(peaks, dtype=np.int32).reshape(-1, 2)
+
+
+def reference_hashes(peaks):
+    """Peak pairing as originally written with nested Python loops."""
+    hashes = []
+    for i, (t1, f1) in enumerate(peaks):
+        targets = 0
+        for j in range(i + 1, len(peaks)):
+            t2, f2 = peaks[j]
+            delta_t = t2 - t1
+            if delta_t < TARGET_ZONE_START:
+                continue
+            if delta_t > TARGET_ZONE_END:
+                break
+            hashes.append((pack_hash(f1, f2, delta_t), t1))
+            targets += 1
+            if targets >= FAN_OUT:
+                break
+    return hashes
+
+
+def make_song(seed, seconds):
+    """Synthesize a deterministic sequence of random chords plus noise."""
+    rng = np.random.default_rng(seed)
+    n = SAMPLE_RATE * seconds
+    t = np.arange(n) / SAMPLE_RATE
+    audio = np.zeros(n)
+    step = SAMPLE_RATE // 4
+    for start in range(0, n, step):
+        seg = slice(start, start + step)
+        for freq in rng.uniform(200, 3000, size=3):
+            audio[seg] += np.sin(2 * np.pi * freq * t[seg])
+    audio += 0.05 * rng.standard_normal(n)
+    return (audio / np.abs(audio).max()).astype(np.float32)
+
+
+@pytest.mark.parametrize("shape", [(513, 300), (513, 1), (12, 40), (5, 3)])
+@pytest.mark.parametrize("dtype", [np.float32, np.int16])
+def test_find_peaks_matches_maximum_filter(shape, dtype):
+    rng = np.random.default_rng(0)
+    spectrogram = (rng.random(shape) ** 4 * 1000).astype(dtype)
+    # Plateaus of equal values exercise the tie handling
+    spectrogram[3:5, 0:2] = spectrogram.max()
+
+    np.testing.assert_array_equal(find_peaks(spectrogram), reference_peaks(spectrogram))
+
+
+def test_find_peaks_on_transposed_spectrogram():
+    rng = np.random.default_rng(1)
+    spectrogram = rng.integers(0, 30000, size=(400, 513), dtype=np.int16).T
+
+    np.testing.assert_array_equal(find_peaks(spectrogram), reference_peaks(spectrogram))
+
+
+@pytest.mark.parametrize("n_peaks", [0, 1, 5, 300, 3000])
+def test_generate_hashes_matches_reference_loop(n_peaks):
+    rng = np.random.default_rng(n_peaks)
+    peaks = np.stack([rng.integers(0, 2000, n_peaks), rng.integers(0, 513, n_peaks)], axis=1)
+    peaks = peaks[np.argsort(peaks[:, 0], kind="stable")]
+
+    hashes, offsets = generate_hashes(peaks)
+
+    assert list(zip(hashes.tolist(), offsets.tolist())) == reference_hashes(peaks.tolist())
+
+
+def test_generate_hashes_with_simultaneous_peaks():
+    # Many peaks per frame: TARGET_ZONE_START skips and FAN_OUT caps both apply
+    peaks = np.array([(i // 10, (i * 37) % 513) for i in range(500)])
+
+    hashes, offsets = generate_hashes(peaks)
+
+    assert list(zip(hashes.tolist(), offsets.tolist())) == reference_hashes(peaks.tolist())
+
+
+def test_generate_hashes_rejects_unsorted_peaks():
+    with pytest.raises(ValueError):
+        generate_hashes(np.array([[5, 1], [3, 2]]))
+
+
+def test_add_and_identify_round_trip(tmp_path):
+    shazam = Shazam(str(tmp_path / "fingerprints.db"))
+    songs = {}
+    for seed in range(3):
+        audio = make_song(seed, seconds=30)
+        path = tmp_path / f"song{seed}.wav"
+        soundfile.write(path, audio, SAMPLE_RATE)
+        songs[seed] = audio
+        shazam.add_song(str(path))
+
+    # Noisy 10 second excerpt of song 1
+    rng = np.random.default_rng(42)
+    clip = songs[1][SAMPLE_RATE * 10:SAMPLE_RATE * 20]
+    clip = clip + 0.3 * rng.standard_normal(len(clip)).astype(np.float32)
+    soundfile.write(tmp_path / "clip.wav", clip, SAMPLE_RATE)
+
+    result = shazam.identify(str(tmp_path / "clip.wav"))
+
+    assert result is not None
+    assert result.song_name == "song1"
+    assert shazam.stats()["songs"] == 3
+
+    # Audio that is not in the database
+    soundfile.write(tmp_path / "other.wav", make_song(99, seconds=10), SAMPLE_RATE)
+    assert shazam.identify(str(tmp_path / "other.wav")) is None
+
+
+def test_query_keeps_only_top_candidates(tmp_path):
+    db = FingerprintDatabase(str(tmp_path / "fingerprints.db"))
+    rng = np.random.default_rng(0)
+    # Song n shares 10 * n hashes with the query, plus hashes of its own
+    for n in range(1, 7):
+        hashes = np.concatenate([np.arange(10 * n), 1000 * n + np.arange(50)])
+        db.insert_song(f"song{n}", hashes, rng.integers(0, 500, size=len(hashes)))
+
+    query_hashes = np.arange(100)
+    query_offsets = rng.integers(0, 100, size=100)
+    all_matches = db.query(query_hashes, query_offsets)
+    song_ids, db_offsets, q_offsets = db.query(query_hashes, query_offsets, max_candidates=3)
+
+    assert set(song_ids.tolist()) == {4, 5, 6}
+    keep = np.isin(all_matches[0], [4, 5, 6])
+    expected = sorted(zip(*(column[keep].tolist() for column in all_matches)))
+    assert sorted(zip(song_ids.tolist(), db_offsets.tolist(), q_offsets.tolist())) == expected
+
+
+def test_old_schema_is_rejected(tmp_path):
+    db_path = tmp_path / "old.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE fingerprints (hash TEXT NOT NULL, song_id INTEGER, time_offset INTEGER)")
+
+    with pytest.raises(RuntimeError, match="schema version"):
+        Shazam(str(db_path))
+
+
+def test_reopening_does_not_write(tmp_path):
+    db_path = tmp_path / "fingerprints.db"
+    Shazam(str(db_path)).db.close()
+
+    with sqlite3.connect(db_path) as conn:
+        before = conn.execute("PRAGMA data_version").fetchone()[0]
+        Shazam(str(db_path)).list_songs()
+        assert conn.execute("PRAGMA data_version").fetchone()[0] == before
+
+
+def test_identify_attenuated_clip(tmp_path):
+    shazam = Shazam(str(tmp_path / "fingerprints.db"))
+    songs = {}
+    for seed in range(2):
+        songs[seed] = make_song(seed, seconds=20)
+        soundfile.write(tmp_path / f"song{seed}.wav", songs[seed], SAMPLE_RATE)
+        shazam.add_song(str(tmp_path / f"song{seed}.wav"))
+
+    # About -70 dBFS, so most bins would fall under an absolute -80 dB floor
+    clip = 3e-4 * songs[1][SAMPLE_RATE * 5:SAMPLE_RATE * 15]
+    soundfile.write(tmp_path / "quiet.wav", clip, SAMPLE_RATE)
+
+    result = shazam.identify(str(tmp_path / "quiet.wav"))
+
+    assert result is not None
+    assert result.song_name == "song1"